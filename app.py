@@ -1,33 +1,168 @@
 from flask import Flask, request, Response, jsonify
+import logging
+import io
+import json
 import os
 import re
 import markdown2
-import google.generativeai as genai
 from dotenv import load_dotenv
-import instructor
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List
 from pydantic import BaseModel, Field
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
+from backends import create_backend
+from compression import compress_response, iter_request_body
+from incremental import LectureState, LectureStore, plan_windows
+from instrumentation import SIZE_BUCKETS, Counter, Gauge, Histogram, Registry, log_event
+from jobs import JobManager, QueueFull
+from notes_cache import NotesCache, Uncached, cache_key
+from ratelimit import QuotaLimiter, is_rate_limit_error
+from streaming_json import parse_object
+from transcript import PreparedTranscript, Segment, estimate_tokens, format_segments, prepare_transcript_lines, timestamp_to_seconds
 
 app = Flask(__name__)
 
 # Load environment variables
 load_dotenv()
 
-# Configure Google AI
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+app.logger.setLevel(os.getenv("LOG_LEVEL", "INFO"))
+# Request logs are sampled and every field is capped, so multi-megabyte
+# transcripts never get formatted into the log
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+LOG_FIELD_MAX_CHARS = int(os.getenv("LOG_FIELD_MAX_CHARS", "200"))
 
-model = genai.GenerativeModel('gemini-1.5-flash')
-client = instructor.from_gemini(
-    client=genai.GenerativeModel(
-        model_name="models/gemini-1.5-flash",
-    ),
-    mode=instructor.Mode.GEMINI_JSON,
-)
+# Request bodies may be gzip or zstd encoded; both the size on the wire and
+# the decompressed size are capped
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", str(16 * 1024 * 1024)))
+MAX_DECOMPRESSED_BYTES = int(os.getenv("MAX_DECOMPRESSED_BYTES", str(64 * 1024 * 1024)))
+app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BYTES
+RESPONSE_COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+RESPONSE_COMPRESS_LEVEL = int(os.getenv("RESPONSE_COMPRESS_LEVEL", "6"))
+
+metrics = Registry()
+stage_seconds = metrics.register(Histogram(
+    "notes_stage_seconds", "Time spent in each stage of note generation", ["stage"]))
+transcript_chars = metrics.register(Histogram(
+    "notes_transcript_chars", "Size of incoming transcripts in characters", buckets=SIZE_BUCKETS))
+output_chars = metrics.register(Histogram(
+    "notes_output_chars", "Size of rendered HTML notes in characters", buckets=SIZE_BUCKETS))
+attempts_used = metrics.register(Histogram(
+    "notes_attempts", "Prompt attempts needed per generation", ["kind"], buckets=(1, 2, 3)))
+validation_retries = metrics.register(Counter(
+    "notes_validation_retries_total", "Structured output validation retries"))
+in_flight = metrics.register(Gauge(
+    "notes_requests_in_flight", "Requests currently being handled", ["endpoint"]))
+rate_limited = metrics.register(Counter(
+    "notes_rate_limited_total", "Model calls rejected with 429 and retried"))
+sections_total = metrics.register(Counter(
+    "notes_sections_total", "Chunked sections by whether they were regenerated or reused", ["source"]))
+errors = metrics.register(Counter(
+    "notes_errors_total", "Errors by endpoint and exception type", ["endpoint", "exception"]))
+
+def record_error(endpoint: str, error: Exception):
+    errors.inc(endpoint=endpoint, exception=type(error).__name__)
+    log_event(app.logger, "error", max_chars=LOG_FIELD_MAX_CHARS, level=logging.WARNING,
+              endpoint=endpoint, exception=type(error).__name__, message=str(error))
+
+# Configure the model backend. NOTES_BACKEND=fake swaps Gemini for an
+# offline fake, see benchmark.py
+backend = create_backend(os.getenv("GEMINI_MODEL", "models/gemini-1.5-flash"))
+MODEL_NAME = backend.model_name
 
 class GoogleDocsNotes(BaseModel):
     title: str = Field(description="Title of the class session")
     summary: str = Field(description="Brief summary of the class content")
     notes_content: str = Field(description="Detailed notes content in markdown format")
 
+class SectionNotes(BaseModel):
+    heading: str = Field(description="Short heading for this part of the class")
+    summary: str = Field(description="One or two sentence summary of this part of the class")
+    notes_content: str = Field(description="Detailed notes for this part of the class in markdown format")
+
+class NotesOverview(BaseModel):
+    title: str = Field(description="Title of the class session")
+    summary: str = Field(description="Brief summary of the class content")
+
+# Transcripts above CHUNKED_THRESHOLD_TOKENS are split into windows of at most
+# CHUNK_TOKEN_BUDGET tokens, summarized in parallel and merged
+CHUNKED_THRESHOLD_TOKENS = int(os.getenv("CHUNKED_THRESHOLD_TOKENS", "8000"))
+CHUNK_TOKEN_BUDGET = int(os.getenv("CHUNK_TOKEN_BUDGET", "4000"))
+chunk_executor = ThreadPoolExecutor(max_workers=int(os.getenv("CHUNK_WORKERS", "8")))
+
+# Inputs above DETAILED_PROMPT_MAX_TOKENS skip straight to the shorter prompt
+# rather than waiting for the detailed one to overflow
+DETAILED_PROMPT_MAX_TOKENS = int(os.getenv("DETAILED_PROMPT_MAX_TOKENS", "4000"))
+COMPACT_WINDOW_SECONDS = int(os.getenv("COMPACT_WINDOW_SECONDS", "30"))
+
+compaction_lock = threading.Lock()
+compaction_stats = {"transcripts": 0, "tokens_before": 0, "tokens_after": 0}
+
+# Every model call draws from the Gemini per-minute quotas. Output tokens
+# count against TPM too but are unknown up front, so a fixed allowance is
+# reserved per call.
+quota_limiter = QuotaLimiter(
+    requests_per_minute=float(os.getenv("GEMINI_RPM", "1000")),
+    tokens_per_minute=float(os.getenv("GEMINI_TPM", "4000000")),
+    burst_seconds=float(os.getenv("GEMINI_BURST_SECONDS", "5")),
+)
+OUTPUT_TOKEN_ALLOWANCE = int(os.getenv("OUTPUT_TOKEN_ALLOWANCE", "2000"))
+RATE_LIMIT_RETRIES = int(os.getenv("RATE_LIMIT_RETRIES", "5"))
+
+# Chunked runs remember their sections per lecture, so when a transcript is
+# fixed or extended only the changed windows go back to the model
+lecture_store = LectureStore(max_entries=int(os.getenv("LECTURE_STORE_SIZE", "512")))
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "200"))
+batch_executor = ThreadPoolExecutor(max_workers=int(os.getenv("BATCH_WORKERS", "16")))
+
+# Jobs decouple HTTP request threads from LLM concurrency: JOB_WORKERS
+# generations run at once and at most JOB_QUEUE_SIZE more wait their turn
+job_manager = JobManager(
+    workers=int(os.getenv("JOB_WORKERS", "4")),
+    max_pending=int(os.getenv("JOB_QUEUE_SIZE", "32")),
+    ttl_seconds=int(os.getenv("JOB_TTL_SECONDS", "600")),
+)
+
+# Identical transcripts (e.g. a whole class opening the same lecture) share one
+# generation. Set NOTES_CACHE_DIR to keep entries across restarts.
+notes_cache = NotesCache(
+    GoogleDocsNotes,
+    max_entries=int(os.getenv("NOTES_CACHE_SIZE", "256")),
+    cache_dir=os.getenv("NOTES_CACHE_DIR") or None,
+)
+
+def call_model(messages: list, response_model):
+    tokens = sum(estimate_tokens(message["content"]) for message in messages) + OUTPUT_TOKEN_ALLOWANCE
+    for retry in range(RATE_LIMIT_RETRIES + 1):
+        quota_limiter.acquire(tokens)
+        try:
+            with stage_seconds.time(stage="llm_call"):
+                response = backend.create(messages=messages, response_model=response_model)
+            quota_limiter.success()
+            break
+        except Exception as e:
+            # Quota errors are not the prompt's fault, so they don't use up
+            # one of the shorter-prompt attempts
+            if not is_rate_limit_error(e) or retry == RATE_LIMIT_RETRIES:
+                raise
+            rate_limited.inc()
+            quota_limiter.backoff()
+    stats = backend.last_call_stats()
+    if stats is not None:
+        stage_seconds.observe(stats["validation_seconds"], stage="validation")
+        validation_retries.inc(stats["validation_retries"])
+    return response
+
+def first_attempt(tokens: int) -> int:
+    if tokens <= DETAILED_PROMPT_MAX_TOKENS:
+        return 0
+    if tokens <= CHUNKED_THRESHOLD_TOKENS:
+        return 1
+    return 2
+
 def generate_class_notes(transcript: str, attempt: int) -> GoogleDocsNotes:
     system_prompt = """
     You are an AI assistant that generates comprehensive class notes from a given transcript.
@@ -53,7 +188,7 @@ def generate_class_notes(transcript: str, attempt: int) -> GoogleDocsNotes:
     Make sure NOT to exceed the output limit.
     """
 
-    response = client.chat.completions.create(
+    response = call_model(
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt}
@@ -63,46 +198,191 @@ def generate_class_notes(transcript: str, attempt: int) -> GoogleDocsNotes:
 
     return response
 
-def timestamp_to_seconds(timestamp):
-    parts = timestamp.split(':')
-    if len(parts) == 2:
-        return int(parts[0]) * 60 + int(parts[1])
-    elif len(parts) == 3:
-        return int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
-    else:
-        return 0  # Return 0 for invalid formats
+def generate_section_notes(window: List[Segment], attempt: int) -> SectionNotes:
+    system_prompt = """
+    You are an AI assistant that generates comprehensive class notes from part of a class transcript.
+    The notes should be formatted in markdown.
+    """
 
-def create_html_content(notes: GoogleDocsNotes, base_url: str):
+    descriptor = ["detailed", "", "brief"][attempt]
+
+    user_prompt = f"""
+    Please analyze the following part of a class transcript, from [{window[0].timestamp}] to [{window[-1].timestamp}], and generate {descriptor} notes:
+
+    {format_segments(window)}
+
+    Create well-structured notes with the following guidelines:
+    1. Use ## for subheaders and ### below that; the section heading is added separately
+    2. Include timestamps for all bullets in your notes (format: [HH:MM:SS] or [MM:SS] or [H:MM:SS])
+    3. Use bullet points for lists
+    4. Bold important terms or concepts
+
+    Format the notes in markdown so they can be easily converted to HTML.
+
+    Make sure NOT to exceed the output limit.
+    """
+
+    return call_model(
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        response_model=SectionNotes
+    )
+
+def merge_section_notes(sections: List[SectionNotes]) -> NotesOverview:
+    outline = "\n".join(f"- {section.heading}: {section.summary}" for section in sections)
+
+    user_prompt = f"""
+    The following is an outline of a class session, one line per part of the class:
+
+    {outline}
+
+    Give the class session a title and write a brief summary of the whole session.
+    """
+
+    return call_model(
+        messages=[
+            {"role": "system", "content": "You are an AI assistant that summarizes class notes."},
+            {"role": "user", "content": user_prompt}
+        ],
+        response_model=NotesOverview
+    )
+
+def merge_with_retry(sections: List[SectionNotes], max_attempts: int = 3) -> NotesOverview:
+    for attempt in range(max_attempts):
+        try:
+            overview = merge_section_notes(sections)
+            attempts_used.observe(attempt + 1, kind="merge")
+            return overview
+        except Exception as e:
+            log_event(app.logger, "attempt_failed", max_chars=LOG_FIELD_MAX_CHARS, level=logging.WARNING,
+                      stage="merge", attempt=attempt + 1, exception=type(e).__name__, message=str(e))
+            if attempt == max_attempts - 1:
+                raise
+
+def fallback_overview(sections: List[SectionNotes]) -> NotesOverview:
+    # Stands in for a failed merge so the finished sections aren't lost
+    headings = "; ".join(section.heading for section in sections)
+    return NotesOverview(title="Class Notes", summary=f"This class session covers: {headings}.")
+
+def generate_section_with_fallback(window: List[Segment], max_attempts: int = 3) -> SectionNotes:
+    # Only the overflowing window is retried with a shorter prompt
+    start = first_attempt(estimate_tokens(format_segments(window)))
+    for attempt in range(start, max_attempts):
+        try:
+            section = generate_section_notes(window, attempt)
+            attempts_used.observe(attempt - start + 1, kind="section")
+            return section
+        except Exception as e:
+            log_event(app.logger, "attempt_failed", max_chars=LOG_FIELD_MAX_CHARS, level=logging.WARNING,
+                      section=window[0].timestamp, attempt=attempt + 1, exception=type(e).__name__, message=str(e))
+            if attempt == max_attempts - 1:
+                raise
+
+def assemble_notes(overview: NotesOverview, sections: List[SectionNotes]) -> GoogleDocsNotes:
+    notes_content = "\n\n".join(f"# {section.heading}\n\n{section.notes_content}" for section in sections)
+    return GoogleDocsNotes(title=overview.title, summary=overview.summary, notes_content=notes_content)
+
+def plan_chunked_notes(prepared: PreparedTranscript, lecture_key: str = None):
+    """
+    Window the transcript and start generating every window that the
+    lecture's previous run can't supply. Returns the previous state, the
+    plan and one future per window (None for reused windows).
+    """
+    previous = lecture_store.get(lecture_key) if lecture_key else None
+    plan = plan_windows(previous, prepared.segments, CHUNK_TOKEN_BUDGET)
+    # Windows run concurrently, so latency tracks the slowest window
+    futures = [None if window.section is not None else chunk_executor.submit(generate_section_with_fallback, window.segments)
+               for window in plan]
+    reused = sum(future is None for future in futures)
+    sections_total.inc(reused, source="reused")
+    sections_total.inc(len(plan) - reused, source="generated")
+    return previous, plan, futures
+
+def finish_chunked_notes(prepared: PreparedTranscript, previous, plan, sections: List[SectionNotes],
+                         lecture_key: str = None):
+    """
+    Merge the sections into notes. Returns (notes, cacheable); notes built
+    around a fallback overview are not cacheable.
+    """
+    unchanged = (previous is not None and previous.overview is not None and len(plan) == len(previous.windows)
+                 and all(window.section is not None for window in plan))
+    state = None
+    if lecture_key:
+        # Save the sections before merging, so they are reused even if the
+        # merge fails; a missing overview is merged again next time
+        windows = [(window.start, window.end) for window in plan]
+        state = LectureState(prepared.segments, windows, sections, previous.overview if unchanged else None)
+        lecture_store.put(lecture_key, state)
+    if unchanged:
+        return assemble_notes(previous.overview, sections), True
+    try:
+        overview = merge_with_retry(sections)
+    except Exception as e:
+        record_error("merge", e)
+        # Degraded notes must not be cached, or the merge would never be
+        # tried again for this transcript
+        return assemble_notes(fallback_overview(sections), sections), False
+    if state is not None:
+        state.overview = overview
+    return assemble_notes(overview, sections), True
+
+def generate_chunked_notes(prepared: PreparedTranscript, lecture_key: str = None):
+    # Degraded notes come back wrapped in Uncached so notes_cache skips them
+    previous, plan, futures = plan_chunked_notes(prepared, lecture_key)
+    sections = [window.section if future is None else future.result() for window, future in zip(plan, futures)]
+    notes, cacheable = finish_chunked_notes(prepared, previous, plan, sections, lecture_key)
+    return notes if cacheable else Uncached(notes)
+
+HTML_STYLES = """
+            body { font-family: Arial, sans-serif; line-height: 1.6; padding: 20px; max-width: 800px; margin: 0 auto; }
+            h1 { color: #2c3e50; }
+            h2 { color: #34495e; }
+            a { color: #3498db; text-decoration: none; }
+            a:hover { text-decoration: underline; }
+            .summary { background-color: #ecf0f1; padding: 15px; border-radius: 5px; margin-bottom: 20px; }
+"""
+
+# Streamed documents send the title and summary last; flex ordering still
+# shows them above the notes
+STREAM_STYLES = """
+            .document { display: flex; flex-direction: column; }
+            .overview { order: -1; }
+"""
+
+def render_notes_markdown(notes_content: str, base_url: str) -> str:
     def replace_timestamp(match):
         timestamp = match.group(1)
         seconds = timestamp_to_seconds(timestamp)
         return f'<a href="{base_url}&start={seconds}" target="_blank">[{timestamp}]</a>'
 
     # Replace timestamps in the markdown content
-    notes_content_with_links = re.sub(r'\[(\d{1,2}:\d{2}(?::\d{2})?)\]', replace_timestamp, notes.notes_content)
+    with stage_seconds.time(stage="timestamp_rewrite"):
+        notes_content_with_links = re.sub(r'\[(\d{1,2}:\d{2}(?::\d{2})?)\]', replace_timestamp, notes_content)
 
     # Convert markdown to HTML
-    html_content = markdown2.markdown(notes_content_with_links)
+    with stage_seconds.time(stage="markdown"):
+        return markdown2.markdown(notes_content_with_links)
 
-    # Create full HTML document
-    full_html = f"""
+def html_head(title: str, extra_styles: str = "") -> str:
+    return f"""
     <!DOCTYPE html>
     <html lang="en">
     <head>
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>{notes.title}</title>
-        <style>
-            body {{ font-family: Arial, sans-serif; line-height: 1.6; padding: 20px; max-width: 800px; margin: 0 auto; }}
-            h1 {{ color: #2c3e50; }}
-            h2 {{ color: #34495e; }}
-            a {{ color: #3498db; text-decoration: none; }}
-            a:hover {{ text-decoration: underline; }}
-            .summary {{ background-color: #ecf0f1; padding: 15px; border-radius: 5px; margin-bottom: 20px; }}
-        </style>
+        <title>{title}</title>
+        <style>{HTML_STYLES}{extra_styles}        </style>
     </head>
     <body>
-        <h1>{notes.title}</h1>
+"""
+
+def create_html_content(notes: GoogleDocsNotes, base_url: str):
+    html_content = render_notes_markdown(notes.notes_content, base_url)
+
+    # Create full HTML document
+    full_html = html_head(notes.title) + f"""        <h1>{notes.title}</h1>
         <div class="summary">
             <h2>Summary</h2>
             <p>{notes.summary}</p>
@@ -115,41 +395,360 @@ def create_html_content(notes: GoogleDocsNotes, base_url: str):
     """
     return full_html
 
+def render_notes(prepared: PreparedTranscript, base_url: str, mode: str = None, lecture_key: str = None) -> str:
+    variant = choose_variant(prepared, mode)
+    # Cache hits are still rendered with this caller's base_url
+    html_content = create_html_content(get_or_generate_notes(prepared, variant, lecture_key), base_url)
+    output_chars.observe(len(html_content))
+    return html_content
+
+def stream_html_content(prepared: PreparedTranscript, base_url: str, lecture_key: str = None):
+    """
+    Yield an HTML document piece by piece: the head right away, then each
+    section as soon as it and every section before it are done, then the
+    title and summary.
+    """
+    yield html_head("Class Notes", STREAM_STYLES) + """        <div class="document">
+        <div class="notes-content">
+"""
+
+    # Streams take part in single-flight like every other request: a stream
+    # for notes already being generated waits for them, and one that
+    # generates them itself releases the key however it ends, including a
+    # client disconnect (GeneratorExit) mid-stream
+    key = cache_key(prepared.text, "chunked", MODEL_NAME)
+    futures = []
+    notes = error = None
+    claimed = False
+    cacheable = True
+    try:
+        notes = notes_cache.claim(key)
+        if notes is not None:
+            yield render_notes_markdown(notes.notes_content, base_url)
+        else:
+            claimed = True
+            previous, plan, futures = plan_chunked_notes(prepared, lecture_key)
+            sections = []
+            for window, future in zip(plan, futures):
+                section = window.section if future is None else future.result()
+                sections.append(section)
+                yield render_notes_markdown(f"# {section.heading}\n\n{section.notes_content}", base_url)
+            notes, cacheable = finish_chunked_notes(prepared, previous, plan, sections, lecture_key)
+    except Exception as e:
+        error = e
+        record_error("generate_notes_stream", e)
+        yield """        </div>
+        <p>Something went wrong while generating the rest of these notes.</p>
+        </div>
+    </body>
+    </html>
+"""
+        return
+    finally:
+        for future in futures:
+            if future is not None:
+                future.cancel()
+        if claimed:
+            notes_cache.release(key, notes, error, store=cacheable)
+
+    yield f"""        </div>
+        <div class="overview">
+            <h1>{notes.title}</h1>
+            <div class="summary">
+                <h2>Summary</h2>
+                <p>{notes.summary}</p>
+            </div>
+        </div>
+        </div>
+    </body>
+    </html>
+"""
+
+def generate_notes_with_fallback(prepared: PreparedTranscript, max_attempts: int = 3) -> GoogleDocsNotes:
+    # Retry with progressively shorter prompts in case the output overflows
+    start = first_attempt(prepared.tokens_after)
+    with stage_seconds.time(stage="attempt_loop"):
+        for attempt in range(start, max_attempts):
+            try:
+                notes = generate_class_notes(prepared.text, attempt)
+                attempts_used.observe(attempt - start + 1, kind="standard")
+                return notes
+            except Exception as e:
+                log_event(app.logger, "attempt_failed", max_chars=LOG_FIELD_MAX_CHARS, level=logging.WARNING,
+                          attempt=attempt + 1, exception=type(e).__name__, message=str(e))
+                if attempt == max_attempts - 1:
+                    raise  # Re-raise the last exception if all attempts fail
+
+NOTES_GENERATORS = {
+    "standard": generate_notes_with_fallback,
+    "chunked": generate_chunked_notes,
+}
+
+def choose_variant(prepared: PreparedTranscript, mode: str = None) -> str:
+    # Incremental regeneration works per section, so it needs chunked mode
+    if mode == "incremental":
+        return "chunked"
+    if mode in NOTES_GENERATORS:
+        return mode
+    if prepared.tokens_after > CHUNKED_THRESHOLD_TOKENS:
+        return "chunked"
+    return "standard"
+
+def get_or_generate_notes(prepared: PreparedTranscript, variant: str = "standard", lecture_key: str = None) -> GoogleDocsNotes:
+    key = cache_key(prepared.text, variant, MODEL_NAME)
+    if variant == "chunked":
+        return notes_cache.get_or_generate(key, lambda: generate_chunked_notes(prepared, lecture_key))
+    return notes_cache.get_or_generate(key, lambda: NOTES_GENERATORS[variant](prepared))
+
+def lecture_key_for(data: dict) -> str:
+    # The Panopto viewer URL identifies the lecture unless the client names it
+    return data.get('lecture_id') or data.get('base_url')
+
+def prepare_transcript_stream(lines, timings: dict = None) -> PreparedTranscript:
+    # Time spent waiting for the next line, e.g. while the request body it
+    # comes from is parsed, doesn't count as compaction. The compaction time
+    # is also added to timings["compaction"] when given.
+    waited = 0.0
+
+    def timed(lines):
+        nonlocal waited
+        lines = iter(lines)
+        while True:
+            start = time.perf_counter()
+            line = next(lines, None)
+            waited += time.perf_counter() - start
+            if line is None:
+                return
+            yield line
+
+    start = time.perf_counter()
+    prepared = prepare_transcript_lines(timed(lines), COMPACT_WINDOW_SECONDS)
+    seconds = time.perf_counter() - start - waited
+    stage_seconds.observe(seconds, stage="compaction")
+    if timings is not None:
+        timings["compaction"] = timings.get("compaction", 0.0) + seconds
+    transcript_chars.observe(prepared.chars_before)
+    with compaction_lock:
+        compaction_stats["transcripts"] += 1
+        compaction_stats["tokens_before"] += prepared.tokens_before
+        compaction_stats["tokens_after"] += prepared.tokens_after
+    return prepared
+
+def prepare_request_transcript(transcript) -> PreparedTranscript:
+    # Top-level transcripts were already compacted while the body streamed in
+    if isinstance(transcript, PreparedTranscript):
+        return transcript
+    if not isinstance(transcript, str):
+        raise ValueError("transcript is required")
+    return prepare_transcript_stream(transcript.splitlines())
+
+def parse_request_json(endpoint: str, stream_transcript: bool = True) -> dict:
+    """
+    Decode and parse the JSON request body incrementally. With
+    stream_transcript, the top-level transcript is compacted line by line
+    as it is read and comes back as a PreparedTranscript.
+    """
+    # Compaction runs inside the parse, so its time is taken back out of
+    # json_parse rather than being counted twice
+    timings = {}
+    start = time.perf_counter()
+    try:
+        chunks = iter_request_body(request.stream, request.headers.get('Content-Encoding'), MAX_DECOMPRESSED_BYTES)
+        streamed = {'transcript': lambda lines: prepare_transcript_stream(lines, timings)} if stream_transcript else None
+        data = parse_object(chunks, streamed)
+    finally:
+        stage_seconds.observe(time.perf_counter() - start - timings.get("compaction", 0.0), stage="json_parse")
+    transcript = data.get('transcript')
+    log_event(app.logger, "request", sample_rate=LOG_SAMPLE_RATE, max_chars=LOG_FIELD_MAX_CHARS,
+              endpoint=endpoint, content_length=request.content_length,
+              content_encoding=request.headers.get('Content-Encoding'),
+              transcript_chars=transcript.chars_before if isinstance(transcript, PreparedTranscript) else None,
+              base_url=data.get('base_url'))
+    return data
+
+@app.before_request
+def reject_oversized_body():
+    # Refuse before reading anything when the declared size is already too big
+    if request.content_length is not None and request.content_length > MAX_REQUEST_BYTES:
+        raise RequestEntityTooLarge()
+
+@app.after_request
+def negotiate_compression(response: Response) -> Response:
+    return compress_response(response, request.accept_encodings,
+                             min_bytes=RESPONSE_COMPRESS_MIN_BYTES, level=RESPONSE_COMPRESS_LEVEL)
+
+def track_stream(chunks, endpoint: str):
+    # Keep the request counted as in flight until the last chunk is sent
+    with in_flight.track(endpoint=endpoint):
+        yield from chunks
+
+def add_token_headers(response: Response, prepared: PreparedTranscript) -> Response:
+    response.headers['X-Transcript-Tokens-Before'] = str(prepared.tokens_before)
+    response.headers['X-Transcript-Tokens-After'] = str(prepared.tokens_after)
+    return response
+
 @app.route('/generate_notes', methods=['POST'])
 def generate_notes():
-    app.logger.info('Received request to /generate_notes')
+    with in_flight.track(endpoint="generate_notes"), stage_seconds.time(stage="request"):
+        try:
+            data = parse_request_json("generate_notes")
+
+            prepared = prepare_request_transcript(data.get('transcript'))
+            base_url = data.get('base_url')
+
+            html_content = render_notes(prepared, base_url, data.get('mode'), lecture_key_for(data))
+            return add_token_headers(Response(html_content, mimetype='text/html'), prepared)
+
+        except HTTPException as e:
+            record_error("generate_notes", e)
+            raise
+        except Exception as e:
+            record_error("generate_notes", e)
+            return "Bad Request", 400
+
+@app.route('/generate_notes/stream', methods=['POST'])
+def generate_notes_stream():
     try:
-        data = request.get_json(force=True)
-        app.logger.info(f'Received data: {data}')
+        data = parse_request_json("generate_notes_stream")
+        prepared = prepare_request_transcript(data.get('transcript'))
+        base_url = data.get('base_url')
+    except HTTPException as e:
+        record_error("generate_notes_stream", e)
+        raise
+    except Exception as e:
+        record_error("generate_notes_stream", e)
+        return "Bad Request", 400
+
+    chunks = track_stream(stream_html_content(prepared, base_url, lecture_key_for(data)), "generate_notes_stream")
+    response = add_token_headers(Response(chunks, mimetype='text/html'), prepared)
+    # Ask reverse proxies not to buffer the chunked body
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
-        transcript = data.get('transcript')
+def render_job(prepared: PreparedTranscript, base_url: str, mode: str = None, lecture_key: str = None) -> str:
+    with in_flight.track(endpoint="job"):
+        try:
+            return render_notes(prepared, base_url, mode, lecture_key)
+        except Exception as e:
+            record_error("job", e)
+            raise
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    try:
+        data = parse_request_json("jobs")
+        prepared = prepare_request_transcript(data.get('transcript'))
         base_url = data.get('base_url')
+    except HTTPException as e:
+        record_error("jobs", e)
+        raise
+    except Exception as e:
+        record_error("jobs", e)
+        return "Bad Request", 400
 
+    try:
+        job = job_manager.submit(render_job, prepared, base_url, data.get('mode'), lecture_key_for(data))
+    except QueueFull as e:
+        record_error("jobs", e)
+        response = jsonify({"error": "Too many pending jobs", "retry_after": e.retry_after})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response
 
-        max_attempts = 3
-        html_content = None
+    response = add_token_headers(jsonify(job.to_dict()), prepared)
+    response.status_code = 202
+    response.headers['Location'] = f"/jobs/{job.id}"
+    return response
 
-        for attempt in range(1, max_attempts + 1):
-            try:
-                
-                html_content = create_html_content(generate_class_notes(transcript, attempt), base_url)
-                break  # If successful, exit the loop
-            except Exception as e:
-                print(f"Attempt {attempt} failed: {str(e)}")
-                if attempt == max_attempts:
-                    print("All attempts failed.")
-                    raise  # Re-raise the last exception if all attempts fail
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    if job.status == "done":
+        return Response(job.result, mimetype='text/html')
+    if job.status == "failed":
+        return jsonify(job.to_dict()), 500
+    return jsonify(job.to_dict())
 
-        if html_content is not None:
-            # Use html_content here
-            print("HTML content created successfully.")
-        else:
-            print("Failed to create HTML content after all attempts.")
-        return Response(html_content, mimetype='text/html')
+def render_batch_item(index: int, item: dict) -> dict:
+    result = {"index": index, "name": item.get('name')}
+    try:
+        prepared = prepare_request_transcript(item.get('transcript'))
+        result["html"] = render_notes(prepared, item.get('base_url'), item.get('mode'), lecture_key_for(item))
+        result["status"] = "done"
+    except Exception as e:
+        record_error("batch", e)
+        result["status"] = "failed"
+        result["error"] = str(e) or type(e).__name__
+    return result
+
+def batch_file_name(result: dict) -> str:
+    name = re.sub(r'[^A-Za-z0-9._-]+', '_', result.get('name') or '').strip('._')
+    return f"{result['index'] + 1:03d}-{name or 'lecture'}.html"
 
-    except:
-        print(f'Bad request')
+def stream_batch_ndjson(futures: list):
+    for future in as_completed(futures):
+        yield json.dumps(future.result()) + "\n"
+
+@app.route('/generate_notes/batch', methods=['POST'])
+def generate_notes_batch():
+    """
+    Generate notes for many lectures at once. Items run concurrently and
+    share the Gemini quota limiter. With format=ndjson (the default) each
+    result is streamed as a JSON line as soon as it finishes; with
+    format=zip the response is a zip of HTML files.
+    """
+    try:
+        data = parse_request_json("batch", stream_transcript=False)
+        items = data.get('items')
+        if not isinstance(items, list) or not items or len(items) > BATCH_MAX_ITEMS:
+            raise ValueError(f"items must be a list of 1 to {BATCH_MAX_ITEMS} lectures")
+        if not all(isinstance(item, dict) for item in items):
+            raise ValueError("each item must be an object")
+        output_format = data.get('format', 'ndjson')
+        if output_format not in ('ndjson', 'zip'):
+            raise ValueError("format must be ndjson or zip")
+    except HTTPException as e:
+        record_error("batch", e)
+        raise
+    except Exception as e:
+        record_error("batch", e)
         return "Bad Request", 400
 
+    futures = [batch_executor.submit(render_batch_item, index, item) for index, item in enumerate(items)]
+
+    if output_format == 'ndjson':
+        chunks = track_stream(stream_batch_ndjson(futures), "batch")
+        response = Response(chunks, mimetype='application/x-ndjson')
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+    with in_flight.track(endpoint="batch"):
+        buffer = io.BytesIO()
+        failures = []
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for future in futures:
+                result = future.result()
+                if result["status"] == "done":
+                    archive.writestr(batch_file_name(result), result["html"])
+                else:
+                    failures.append({key: result[key] for key in ("index", "name", "error")})
+            if failures:
+                archive.writestr("errors.json", json.dumps(failures, indent=2))
+    response = Response(buffer.getvalue(), mimetype='application/zip')
+    response.headers['Content-Disposition'] = 'attachment; filename="notes.zip"'
+    return response
+
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    with compaction_lock:
+        compaction = dict(compaction_stats)
+    return jsonify(dict(notes_cache.stats(), compaction=compaction, quota=quota_limiter.stats()))
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,160 @@
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+
+TIMESTAMP_RE = re.compile(r'\[(\d{1,2}:\d{2}(?::\d{2})?)\]')
+
+
+class NotesBackend:
+    """Turns chat messages into an instance of a pydantic response model."""
+
+    model_name = None
+
+    def create(self, messages: list, response_model):
+        raise NotImplementedError
+
+    def last_call_stats(self):
+        """
+        Details of this thread's last create() call, as a dict with
+        validation_seconds and validation_retries, or None if unknown.
+        """
+        return None
+
+
+class GeminiBackend(NotesBackend):
+    def __init__(self, model_name: str, api_key: str = None, validation_attempts: int = 1):
+        # Imported here so the fake backend works without the Gemini SDK
+        import google.generativeai as genai
+        import instructor
+        from tenacity import Retrying, stop_after_attempt
+
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self._local = threading.local()
+        model = genai.GenerativeModel(
+            model_name=model_name,
+        )
+
+        # Time the API calls themselves, so the rest of create() is
+        # instructor parsing, validating and re-asking. Unlike instructor's
+        # hooks this works on every release, 1.5 included.
+        generate_content = model.generate_content
+
+        def timed_generate_content(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return generate_content(*args, **kwargs)
+            finally:
+                self._local.api_seconds += time.perf_counter() - start
+
+        model.generate_content = timed_generate_content
+        self.client = instructor.from_gemini(
+            client=model,
+            mode=instructor.Mode.GEMINI_JSON,
+        )
+        # instructor takes a tenacity Retrying for max_retries; its before
+        # callback counts the attempts
+        self._retrying = lambda: Retrying(stop=stop_after_attempt(validation_attempts), before=self._before_attempt)
+
+    def _before_attempt(self, retry_state):
+        self._local.attempts += 1
+
+    def create(self, messages: list, response_model):
+        self._local.stats = None
+        self._local.api_seconds = 0.0
+        self._local.attempts = 0
+        start = time.perf_counter()
+        response = self.client.chat.completions.create(
+            messages=messages,
+            response_model=response_model,
+            max_retries=self._retrying(),
+        )
+        self._local.stats = {
+            "validation_seconds": time.perf_counter() - start - self._local.api_seconds,
+            "validation_retries": self._local.attempts - 1,
+        }
+        return response
+
+    def last_call_stats(self):
+        return getattr(self._local, "stats", None)
+
+
+class FakeBackendError(Exception):
+    pass
+
+
+class FakeBackend(NotesBackend):
+    """
+    Offline stand-in for the model, for load tests and local development.
+
+    Responses are deterministic for a given prompt and seed. Every string
+    field of the response model is filled in, and notes fields cite the
+    timestamps found in the prompt so the HTML rendering path is exercised.
+    """
+
+    model_name = "fake"
+
+    def __init__(self, latency: float = 0.5, jitter: float = 0.0, output_chars: int = 2000,
+                 failure_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.output_chars = output_chars
+        self.failure_rate = failure_rate
+        self.seed = seed
+
+    def _rng(self, prompt: str) -> random.Random:
+        digest = hashlib.sha256(f"{self.seed}\0{prompt}".encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _notes(self, rng: random.Random, timestamps: list) -> str:
+        lines = ["## Key points"]
+        size = len(lines[0])
+        i = 0
+        while size < self.output_chars:
+            timestamp = timestamps[i % len(timestamps)] if timestamps else "0:00"
+            line = f"- **Concept {i + 1}** is discussed with example {rng.randint(1, 999)} [{timestamp}]"
+            lines.append(line)
+            size += len(line) + 1
+            i += 1
+        return "\n".join(lines)
+
+    def create(self, messages: list, response_model):
+        prompt = "\n".join(message["content"] for message in messages)
+        rng = self._rng(prompt)
+
+        delay = self.latency + rng.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if rng.random() < self.failure_rate:
+            raise FakeBackendError("Simulated model failure")
+
+        timestamps = TIMESTAMP_RE.findall(prompt)
+        fields = {}
+        for name in response_model.model_fields:
+            if "notes" in name:
+                fields[name] = self._notes(rng, timestamps)
+            elif "summary" in name:
+                fields[name] = f"A lecture covering {rng.randint(2, 9)} related topics."
+            else:
+                fields[name] = f"Lecture {rng.randint(1, 99)}"
+        return response_model(**fields)
+
+
+def create_backend(model_name: str) -> NotesBackend:
+    """Pick the backend named by NOTES_BACKEND ("gemini" or "fake")."""
+    kind = os.getenv("NOTES_BACKEND", "gemini")
+    if kind == "fake":
+        return FakeBackend(
+            latency=float(os.getenv("FAKE_LATENCY", "0.5")),
+            jitter=float(os.getenv("FAKE_JITTER", "0.0")),
+            output_chars=int(os.getenv("FAKE_OUTPUT_CHARS", "2000")),
+            failure_rate=float(os.getenv("FAKE_FAILURE_RATE", "0.0")),
+            seed=int(os.getenv("FAKE_SEED", "0")),
+        )
+    if kind == "gemini":
+        return GeminiBackend(model_name, api_key=os.getenv("GOOGLE_API_KEY"),
+                             validation_attempts=int(os.getenv("VALIDATION_ATTEMPTS", "1")))
+    raise ValueError(f"Unknown NOTES_BACKEND: {kind}")
@@ -0,0 +1,168 @@
+"""
+Load test for /generate_notes against the offline fake backend.
+
+Drives the app over real HTTP at each concurrency level with synthetic
+transcripts between 10 and 120 minutes long, and reports latency
+percentiles, throughput and peak RSS. The server runs in the benchmark's
+own process, so the RSS figure is the lifetime peak of server and load
+generator together, not of the server alone. The Gemini quota limiter
+is lifted unless --quota is given. Example:
+
+    python benchmark.py --concurrency 1,8,32 --requests 64 --latency 0.3
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+WORDS = (
+    "the a we so this that function recursion base case stack memory pointer array list "
+    "value return call proof induction graph node edge tree search sort complexity big "
+    "example notice here right okay now let's look at how why when because"
+).split()
+FILLERS = ["um", "uh", "you know,"]
+
+
+def synthetic_transcript(minutes: int, seed: int) -> str:
+    """Caption lines in the content script's "text+MM:SS" format."""
+    rng = random.Random(seed)
+    lines = []
+    seconds = 0
+    while seconds < minutes * 60:
+        words = [rng.choice(WORDS) for _ in range(rng.randint(4, 14))]
+        if rng.random() < 0.3:
+            words.insert(rng.randrange(len(words)), rng.choice(FILLERS))
+        hours, rest = divmod(seconds, 3600)
+        timestamp = f"{hours}:{rest // 60:02d}:{rest % 60:02d}" if hours else f"{rest // 60}:{rest % 60:02d}"
+        lines.append(" ".join(words) + timestamp)
+        seconds += rng.randint(2, 6)
+    return "\n".join(lines) + "\n"
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def process_peak_rss_mb() -> float:
+    # Peak over the whole process lifetime, load generator included
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def post_notes(url: str, transcript: str, lecture_id: int) -> float:
+    # A distinct base_url per transcript, so incremental reuse never
+    # mistakes one synthetic lecture for an edit of another
+    base_url = f"https://example.panopto.com/Viewer.aspx?id={lecture_id}"
+    body = json.dumps({"transcript": transcript, "base_url": base_url}).encode("utf-8")
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=600) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def run_level(url: str, concurrency: int, requests: int, durations: list, seed: int) -> dict:
+    transcripts = [(synthetic_transcript(durations[i % len(durations)], seed + i), seed + i) for i in range(requests)]
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def worker(item):
+        nonlocal errors
+        transcript, lecture_id = item
+        try:
+            elapsed = post_notes(url, transcript, lecture_id)
+        except (urllib.error.URLError, OSError):
+            with lock:
+                errors += 1
+            return
+        with lock:
+            latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, transcripts))
+    wall = time.perf_counter() - start
+
+    result = {"concurrency": concurrency, "requests": requests, "errors": errors,
+              "rps": len(latencies) / wall if wall else 0.0, "process_peak_rss_mb": process_peak_rss_mb()}
+    for pct in (50, 95, 99):
+        result[f"p{pct}"] = percentile(latencies, pct) if latencies else float("nan")
+    return result
+
+
+def parse_ints(value: str) -> list:
+    return [int(part) for part in value.split(",") if part]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=parse_ints, default=[1, 4, 16, 32])
+    parser.add_argument("--requests", type=int, default=32, help="requests per concurrency level")
+    parser.add_argument("--minutes", type=parse_ints, default=[10, 30, 60, 90, 120],
+                        help="transcript lengths to cycle through")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake model latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--output-chars", type=int, default=2000)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", action="store_true", help="keep the notes cache and lecture store enabled")
+    parser.add_argument("--quota", action="store_true",
+                        help="keep the Gemini RPM/TPM limiter at its configured quota")
+    parser.add_argument("--json", action="store_true", help="print one JSON object per level")
+    args = parser.parse_args()
+
+    # The app reads its configuration at import time
+    os.environ["NOTES_BACKEND"] = "fake"
+    os.environ["FAKE_LATENCY"] = str(args.latency)
+    os.environ["FAKE_JITTER"] = str(args.jitter)
+    os.environ["FAKE_OUTPUT_CHARS"] = str(args.output_chars)
+    os.environ["FAKE_FAILURE_RATE"] = str(args.failure_rate)
+    os.environ["FAKE_SEED"] = str(args.seed)
+    if not args.quota:
+        # The fake backend has no quota; without this the numbers measure
+        # limiter sleeps rather than the server
+        os.environ["GEMINI_RPM"] = "1e9"
+        os.environ["GEMINI_TPM"] = "1e12"
+    if not args.cache:
+        os.environ["NOTES_CACHE_SIZE"] = "0"
+        os.environ["LECTURE_STORE_SIZE"] = "0"
+        os.environ.pop("NOTES_CACHE_DIR", None)
+
+    from werkzeug.serving import make_server
+    from app import app
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/generate_notes"
+
+    if not args.json:
+        print(f"{'conc':>5} {'reqs':>5} {'err':>4} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'req/s':>8} {'proc MB':>8}")
+    try:
+        for level, concurrency in enumerate(args.concurrency):
+            # Offset seeds per level so the cache never sees a repeat
+            result = run_level(url, concurrency, args.requests, args.minutes, args.seed + level * args.requests)
+            if args.json:
+                print(json.dumps(result))
+            else:
+                print(f"{result['concurrency']:>5} {result['requests']:>5} {result['errors']:>4} "
+                      f"{result['p50']:>8.3f} {result['p95']:>8.3f} {result['p99']:>8.3f} "
+                      f"{result['rps']:>8.2f} {result['process_peak_rss_mb']:>8.1f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
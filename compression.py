@@ -0,0 +1,113 @@
+import zlib
+
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+# zstd is optional; without the zstandard package only gzip is offered
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+READ_SIZE = 64 * 1024
+COMPRESSIBLE_MIMETYPES = ("text/html", "text/plain", "application/json", "application/x-ndjson")
+
+
+def supported_encodings() -> list:
+    return ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+
+
+def _iter_raw(stream):
+    while True:
+        chunk = stream.read(READ_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _iter_zlib(stream, wbits: int):
+    decompressor = zlib.decompressobj(wbits)
+    for chunk in _iter_raw(stream):
+        # Bound each step's output so a tiny chunk can't inflate past the
+        # size limit before it is checked
+        data = decompressor.decompress(chunk, READ_SIZE)
+        yield data
+        while decompressor.unconsumed_tail:
+            yield decompressor.decompress(decompressor.unconsumed_tail, READ_SIZE)
+    yield decompressor.flush()
+
+
+def iter_request_body(stream, content_encoding: str, max_bytes: int):
+    """
+    Yield the request body in chunks, decompressed according to
+    content_encoding. Raises RequestEntityTooLarge as soon as more than
+    max_bytes have come out, so a small compressed body can't expand
+    without bound.
+    """
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding == "identity":
+        chunks = _iter_raw(stream)
+    elif encoding in ("gzip", "x-gzip"):
+        chunks = _iter_zlib(stream, 16 + zlib.MAX_WBITS)
+    elif encoding == "deflate":
+        chunks = _iter_zlib(stream, zlib.MAX_WBITS)
+    elif encoding == "zstd" and zstandard is not None:
+        chunks = _iter_raw(zstandard.ZstdDecompressor().stream_reader(stream, read_across_frames=True))
+    else:
+        raise UnsupportedMediaType(f"Unsupported Content-Encoding: {content_encoding}")
+
+    total = 0
+    for chunk in chunks:
+        total += len(chunk)
+        if total > max_bytes:
+            raise RequestEntityTooLarge()
+        if chunk:
+            yield chunk
+
+
+class _ResponseCompressor:
+    def __init__(self, encoding: str, level: int):
+        if encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+            self._sync = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+            self._finish = zstandard.COMPRESSOBJ_FLUSH_FINISH
+        else:
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._sync = zlib.Z_SYNC_FLUSH
+            self._finish = zlib.Z_FINISH
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(self._finish)
+
+    def compress_stream(self, chunks):
+        # Flush after every chunk so streamed sections still arrive promptly
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            data = self._compressor.compress(chunk) + self._compressor.flush(self._sync)
+            if data:
+                yield data
+        yield self._compressor.flush(self._finish)
+
+
+def compress_response(response, accept_encodings, min_bytes: int = 1024, level: int = 6):
+    """Compress a Flask response in place if the client accepts it."""
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    encoding = accept_encodings.best_match(supported_encodings())
+    if encoding is None:
+        return response
+
+    response.vary.add("Accept-Encoding")
+    if response.is_streamed:
+        chunks = response.response
+        response.response = _ResponseCompressor(encoding, level).compress_stream(chunks)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < min_bytes:
+            return response
+        response.set_data(_ResponseCompressor(encoding, level).compress(data))
+    response.headers["Content-Encoding"] = encoding
+    return response
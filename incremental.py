@@ -0,0 +1,118 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from typing import List, Optional, Tuple
+
+from transcript import Segment, estimate_tokens, split_into_windows
+
+
+@dataclass
+class LectureState:
+    """What the previous run of a lecture produced, kept for reuse."""
+    segments: List[Segment]
+    windows: List[Tuple[int, int]]
+    sections: list
+    overview: object
+
+
+@dataclass
+class PlannedWindow:
+    start: int
+    end: int
+    segments: List[Segment]
+    # Set when the notes from the previous run still apply
+    section: object = None
+
+
+def _segment_key(segment: Segment) -> tuple:
+    return (segment.seconds, segment.text)
+
+
+def _window_tokens(segments: List[Segment]) -> int:
+    # Same estimate as split_into_windows, "[MM:SS] " prefix included
+    return sum(estimate_tokens(segment.text) + 3 for segment in segments)
+
+
+def plan_windows(previous: Optional[LectureState], segments: List[Segment], token_budget: int) -> List[PlannedWindow]:
+    """
+    Split segments into windows, reusing the previous run's windows wherever
+    all of their segments are unchanged.
+
+    The old and new segment lists are diffed; an old window survives when
+    its segments appear, in order and contiguous, in the new list. Runs of
+    new or changed segments between survivors are windowed from scratch,
+    except that a run under a quarter of the budget is folded into a
+    neighbouring window (which is then regenerated) instead of becoming a
+    section of its own.
+    """
+    reused = []
+    if previous is not None:
+        matcher = SequenceMatcher(None, [_segment_key(s) for s in previous.segments],
+                                  [_segment_key(s) for s in segments], autojunk=False)
+        old_to_new = {}
+        for block in matcher.get_matching_blocks():
+            for offset in range(block.size):
+                old_to_new[block.a + offset] = block.b + offset
+
+        for (start, end), section in zip(previous.windows, previous.sections):
+            if start not in old_to_new:
+                continue
+            new_start = old_to_new[start]
+            if all(old_to_new.get(start + offset) == new_start + offset for offset in range(end - start)):
+                new_end = new_start + (end - start)
+                reused.append(PlannedWindow(new_start, new_end, segments[new_start:new_end], section))
+
+    plan = []
+    position = 0
+    for window in reused + [PlannedWindow(len(segments), len(segments), [])]:
+        gap = segments[position:window.start]
+        gap_tokens = _window_tokens(gap)
+        if gap and previous is not None and gap_tokens < token_budget // 4:
+            # Fold into whichever neighbour is smaller, as long as it fits
+            neighbours = []
+            if plan:
+                neighbours.append((_window_tokens(plan[-1].segments), "before"))
+            if window.segments:
+                neighbours.append((_window_tokens(window.segments), "after"))
+            neighbours = [n for n in neighbours if n[0] + gap_tokens <= token_budget]
+            if neighbours:
+                _, side = min(neighbours)
+                if side == "before":
+                    plan[-1] = PlannedWindow(plan[-1].start, window.start, plan[-1].segments + gap)
+                else:
+                    window = PlannedWindow(position, window.end, gap + window.segments)
+                gap = []
+                position = window.start
+        for fresh in split_into_windows(gap, token_budget):
+            plan.append(PlannedWindow(position, position + len(fresh), fresh))
+            position += len(fresh)
+        if window.segments:
+            plan.append(window)
+            position = window.end
+    return plan
+
+
+class LectureStore:
+    """Bounded LRU of LectureState, keyed by lecture (e.g. its base_url)."""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[LectureState]:
+        with self._lock:
+            state = self._entries.get(key)
+            if state is not None:
+                self._entries.move_to_end(key)
+            return state
+
+    def put(self, key: str, state: LectureState):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = state
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,99 @@
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Job:
+    def __init__(self, job_id: str):
+        self.id = job_id
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.monotonic()
+        self.finished_at = None
+
+    def to_dict(self) -> dict:
+        data = {"job_id": self.id, "status": self.status}
+        if self.error is not None:
+            data["error"] = self.error
+        return data
+
+
+class JobManager:
+    """
+    Runs jobs on a fixed-size thread pool.
+
+    At most workers + max_pending jobs are accepted at once; beyond that
+    submit raises QueueFull so callers can shed load instead of piling up
+    blocked threads. Finished jobs are forgotten ttl_seconds after they
+    complete.
+    """
+
+    def __init__(self, workers: int = 4, max_pending: int = 32, ttl_seconds: int = 600):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="notes-job")
+        self._jobs = {}
+        self._active = 0
+        self._avg_duration = 30.0
+        self._lock = threading.Lock()
+
+    def _expire(self):
+        # Caller must hold the lock
+        cutoff = time.monotonic() - self.ttl_seconds
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _retry_after(self) -> int:
+        # Caller must hold the lock. Roughly how long until a worker frees up.
+        return max(1, math.ceil(self._avg_duration / self.workers))
+
+    def submit(self, fn, *args) -> Job:
+        with self._lock:
+            self._expire()
+            if self._active >= self.workers + self.max_pending:
+                raise QueueFull(self._retry_after())
+            job = Job(uuid.uuid4().hex)
+            self._jobs[job.id] = job
+            self._active += 1
+        self._executor.submit(self._run, job, fn, args)
+        return job
+
+    def _run(self, job: Job, fn, args):
+        job.status = "running"
+        started = time.monotonic()
+        try:
+            job.result = fn(*args)
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e) or type(e).__name__
+            job.status = "failed"
+        finally:
+            job.finished_at = time.monotonic()
+            with self._lock:
+                self._active -= 1
+                self._avg_duration = 0.8 * self._avg_duration + 0.2 * (job.finished_at - started)
+
+    def get(self, job_id: str):
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._expire()
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return dict(counts, active=self._active, workers=self.workers, max_pending=self.max_pending)
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+def normalize_transcript(transcript: str) -> str:
+    # Collapse whitespace so cosmetic differences in the scraped captions
+    # don't defeat the cache
+    lines = (" ".join(line.split()) for line in transcript.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def cache_key(transcript: str, variant: str, model_name: str) -> str:
+    digest = hashlib.sha256()
+    for part in (normalize_transcript(transcript), variant, model_name):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class Uncached:
+    """
+    Returned by a generate() callable to hand value to the caller and any
+    waiters without caching it, e.g. for degraded notes worth retrying.
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class NotesCache:
+    """
+    Content-addressed cache for generated notes.
+
+    Entries live in a bounded in-memory LRU and, when cache_dir is set, in
+    JSON files on disk so they survive restarts. Concurrent misses for the
+    same key are coalesced so only one generation runs at a time.
+    """
+
+    def __init__(self, model_cls, max_entries: int = 256, cache_dir: str = None):
+        self.model_cls = model_cls
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_disk(self, key: str):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                return self.model_cls.model_validate(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            # A corrupt or half-written file is treated as a miss
+            return None
+
+    def _write_disk(self, key: str, value):
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(value.model_dump(), f)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _remember(self, key: str, value):
+        # Caller must hold the lock
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = self._read_disk(key)
+        if value is not None:
+            with self._lock:
+                self._remember(key, value)
+        return value
+
+    def put(self, key: str, value):
+        with self._lock:
+            self._remember(key, value)
+        self._write_disk(key, value)
+
+    def claim(self, key: str):
+        """
+        Return the value for key, waiting for it if another thread is
+        already generating it.
+
+        Returns None on a miss; the caller then owns the generation and must
+        call release() when it is done, whatever the outcome.
+        """
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return self._entries[key]
+                flight = self._flights.get(key)
+                if flight is None:
+                    self._flights[key] = _Flight()
+                    break
+                self._stats["coalesced"] += 1
+
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            if flight.result is not None:
+                return flight.result
+            # The owner gave up without a result, so try to take over
+
+        value = self._read_disk(key)
+        if value is not None:
+            # Already on disk, so only the in-memory LRU needs it
+            with self._lock:
+                self._stats["disk_hits"] += 1
+                self._remember(key, value)
+            self._finish(key, value)
+            return value
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def release(self, key: str, value=None, error: Exception = None, store: bool = True):
+        """
+        Finish a generation claimed with claim(): cache value (unless store
+        is False), or hand error to the threads waiting for it. With
+        neither, the generation was abandoned and one of the waiters takes
+        it over.
+        """
+        if value is not None and store:
+            self.put(key, value)
+        self._finish(key, value, error)
+
+    def _finish(self, key: str, value=None, error: Exception = None):
+        with self._lock:
+            flight = self._flights.pop(key, None)
+            if error is not None:
+                self._stats["errors"] += 1
+        if flight is not None:
+            flight.result = value
+            flight.error = error
+            flight.done.set()
+
+    def get_or_generate(self, key: str, generate):
+        """
+        Return the cached value for key, calling generate() on a miss.
+
+        If another thread is already generating the same key, wait for its
+        result instead of starting a second generation. generate() may
+        return Uncached(value) to keep value out of the cache.
+        """
+        value = self.claim(key)
+        if value is not None:
+            return value
+
+        error = None
+        store = True
+        try:
+            value = generate()
+            if isinstance(value, Uncached):
+                value, store = value.value, False
+            return value
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.release(key, value, error, store)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(
+                self._stats,
+                entries=len(self._entries),
+                max_entries=self.max_entries,
+                in_flight=len(self._flights),
+                disk_enabled=bool(self.cache_dir),
+            )
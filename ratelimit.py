@@ -0,0 +1,100 @@
+import threading
+import time
+
+
+class QuotaLimiter:
+    """
+    Token buckets for a requests-per-minute and a tokens-per-minute quota.
+
+    Each bucket holds only burst_seconds worth of quota, so no 60 s window
+    sees more than the quota plus that small burst. acquire() blocks until
+    one request and the given number of tokens fit in both buckets. When the API still answers 429, backoff() cuts the
+    effective rate and pauses all callers; each success then creeps the
+    rate back up towards the configured quota.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float,
+                 min_rate_fraction: float = 0.1, recovery_step: float = 0.05, burst_seconds: float = 5.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        # At least one request has to fit, however low the quota
+        self.request_capacity = max(1.0, requests_per_minute * burst_seconds / 60)
+        self.token_capacity = tokens_per_minute * burst_seconds / 60
+        self.min_rate_fraction = min_rate_fraction
+        self.recovery_step = recovery_step
+        self._rate_fraction = 1.0
+        self._requests = self.request_capacity
+        self._tokens = self.token_capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._backoff_seconds = 1.0
+        self._throttled = 0
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float):
+        # Caller must hold the lock
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.request_capacity,
+                             self._requests + elapsed * self.requests_per_minute * self._rate_fraction / 60)
+        self._tokens = min(self.token_capacity,
+                           self._tokens + elapsed * self.tokens_per_minute * self._rate_fraction / 60)
+
+    def acquire(self, tokens: int = 0):
+        # A call larger than the bucket waits for a full bucket and then
+        # leaves it in debt, which holds back the callers after it
+        needed = min(tokens, self.token_capacity)
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self._requests >= 1 and self._tokens >= needed:
+                        self._requests -= 1
+                        self._tokens -= tokens
+                        return
+                    rate = self._rate_fraction / 60
+                    wait = max((1 - self._requests) / (self.requests_per_minute * rate),
+                               (needed - self._tokens) / (self.tokens_per_minute * rate))
+                self._cond.wait(max(wait, 0.01))
+
+    def backoff(self):
+        with self._cond:
+            self._throttled += 1
+            self._rate_fraction = max(self.min_rate_fraction, self._rate_fraction / 2)
+            self._paused_until = max(self._paused_until, time.monotonic() + self._backoff_seconds)
+            self._backoff_seconds = min(self._backoff_seconds * 2, 60.0)
+
+    def success(self):
+        with self._cond:
+            self._backoff_seconds = 1.0
+            if self._rate_fraction < 1.0:
+                self._rate_fraction = min(1.0, self._rate_fraction + self.recovery_step)
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                "requests_per_minute": self.requests_per_minute,
+                "tokens_per_minute": self.tokens_per_minute,
+                "rate_fraction": self._rate_fraction,
+                "available_requests": self._requests,
+                "available_tokens": self._tokens,
+                "throttled": self._throttled,
+            }
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    # google.api_core raises ResourceExhausted, which instructor may wrap in
+    # its own retry exception, so look down the cause chain too
+    seen = 0
+    while error is not None and seen < 5:
+        if type(error).__name__ in ("ResourceExhausted", "TooManyRequests", "RateLimitError"):
+            return True
+        if getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429:
+            return True
+        error = error.__cause__ or error.__context__
+        seen += 1
+    return False
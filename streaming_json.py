@@ -0,0 +1,186 @@
+import codecs
+import json
+import re
+
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",:]}"
+_STRING_SPECIAL = re.compile(r'["\\]')
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+_decoder = json.JSONDecoder()
+
+
+class _TextBuffer:
+    """Decodes UTF-8 byte chunks on demand, keeping only unconsumed text."""
+
+    def __init__(self, byte_chunks):
+        self._chunks = iter(byte_chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def _read_chunk(self) -> str:
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self.eof = True
+            return self._decoder.decode(b"", final=True)
+        return self._decoder.decode(chunk)
+
+    def fill(self, min_chars: int = 1) -> bool:
+        """Make min_chars available past pos; False if the input ends first."""
+        while len(self.text) - self.pos < min_chars:
+            if self.eof:
+                return False
+            self.text = self.text[self.pos:] + self._read_chunk()
+            self.pos = 0
+        return True
+
+    def grow(self):
+        # Double the unconsumed text so re-parsing a large value stays linear
+        remaining = len(self.text) - self.pos
+        pieces = [self.text[self.pos:]]
+        added = 0
+        while not self.eof and added <= remaining:
+            piece = self._read_chunk()
+            pieces.append(piece)
+            added += len(piece)
+        self.text = "".join(pieces)
+        self.pos = 0
+
+    def skip_whitespace(self):
+        while self.fill(1) and self.text[self.pos] in _WHITESPACE:
+            self.pos += 1
+
+    def next_char(self) -> str:
+        self.skip_whitespace()
+        if not self.fill(1):
+            raise ValueError("Unexpected end of JSON input")
+        char = self.text[self.pos]
+        self.pos += 1
+        return char
+
+    def peek_char(self) -> str:
+        self.skip_whitespace()
+        return self.text[self.pos] if self.fill(1) else ""
+
+
+def _read_value(buf: _TextBuffer):
+    buf.skip_whitespace()
+    while True:
+        if not buf.fill(1):
+            raise ValueError("Expecting value")
+        try:
+            value, end = _decoder.raw_decode(buf.text, buf.pos)
+        except json.JSONDecodeError:
+            if buf.eof:
+                raise
+            buf.grow()
+            continue
+        # A number cut off by the end of the buffer ("12" of "12.5") may
+        # continue in the next chunk, so only trust a value followed by a
+        # delimiter
+        if not buf.eof and (end == len(buf.text) or buf.text[end] not in _DELIMITERS):
+            buf.grow()
+            continue
+        buf.pos = end
+        return value
+
+
+def _iter_string(buf: _TextBuffer):
+    """Yield the decoded pieces of a JSON string whose opening quote was consumed."""
+    while True:
+        if not buf.fill(1):
+            raise ValueError("Unterminated string")
+        match = _STRING_SPECIAL.search(buf.text, buf.pos)
+        if match is None:
+            piece = buf.text[buf.pos:]
+            buf.pos = len(buf.text)
+            yield piece
+            continue
+        if match.start() > buf.pos:
+            yield buf.text[buf.pos:match.start()]
+        buf.pos = match.start()
+        if buf.text[buf.pos] == '"':
+            buf.pos += 1
+            return
+
+        if not buf.fill(2):
+            raise ValueError("Unterminated string")
+        escape = buf.text[buf.pos + 1]
+        if escape == "u":
+            if not buf.fill(6):
+                raise ValueError("Unterminated string")
+            code = int(buf.text[buf.pos + 2:buf.pos + 6], 16)
+            buf.pos += 6
+            # Surrogate pairs arrive as two consecutive escapes
+            if 0xD800 <= code < 0xDC00 and buf.fill(6) and buf.text.startswith("\\u", buf.pos):
+                low = int(buf.text[buf.pos + 2:buf.pos + 6], 16)
+                if 0xDC00 <= low < 0xE000:
+                    code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)
+                    buf.pos += 6
+            yield chr(code)
+        elif escape in _ESCAPES:
+            buf.pos += 2
+            yield _ESCAPES[escape]
+        else:
+            raise ValueError(f"Invalid escape \\{escape}")
+
+
+def _iter_lines(pieces):
+    partial = []
+    for piece in pieces:
+        parts = piece.split("\n")
+        partial.append(parts[0])
+        if len(parts) == 1:
+            continue
+        yield "".join(partial)
+        yield from parts[1:-1]
+        partial = [parts[-1]]
+    tail = "".join(partial)
+    if tail:
+        yield tail
+
+
+def parse_object(byte_chunks, streamed_fields: dict = None) -> dict:
+    """
+    Parse a JSON object from an iterable of byte chunks.
+
+    Top-level string fields named in streamed_fields are never built as one
+    string: the field's callable receives an iterator over the string's
+    lines as they are decoded, and its return value becomes the field's
+    value. Everything else is parsed as usual. Raises ValueError on
+    malformed input.
+    """
+    streamed_fields = streamed_fields or {}
+    buf = _TextBuffer(byte_chunks)
+    if buf.next_char() != "{":
+        raise ValueError("Expecting a JSON object")
+
+    result = {}
+    if buf.peek_char() == "}":
+        buf.pos += 1
+    else:
+        while True:
+            key = _read_value(buf)
+            if not isinstance(key, str):
+                raise ValueError("Expecting property name")
+            if buf.next_char() != ":":
+                raise ValueError("Expecting ':' delimiter")
+            if key in streamed_fields and buf.peek_char() == '"':
+                buf.pos += 1
+                pieces = _iter_string(buf)
+                result[key] = streamed_fields[key](_iter_lines(pieces))
+                # Consume whatever the callable left unread
+                for _ in pieces:
+                    pass
+            else:
+                result[key] = _read_value(buf)
+            separator = buf.next_char()
+            if separator == "}":
+                break
+            if separator != ",":
+                raise ValueError("Expecting ',' delimiter")
+
+    if buf.peek_char():
+        raise ValueError("Extra data after JSON object")
+    return result
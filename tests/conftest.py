@@ -0,0 +1,12 @@
+import os
+import sys
+
+# The app's modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app reads its configuration at import time; run it against the offline
+# fake backend with no delay, no disk cache and no request logging
+os.environ["NOTES_BACKEND"] = "fake"
+os.environ["FAKE_LATENCY"] = "0"
+os.environ["LOG_SAMPLE_RATE"] = "0"
+os.environ.pop("NOTES_CACHE_DIR", None)
@@ -0,0 +1,64 @@
+import pytest
+
+import app
+from notes_cache import NotesCache
+from transcript import prepare_transcript
+
+
+class FailingMerge:
+    """Wraps the fake backend, failing every overview and counting calls."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.calls = 0
+        self.fail = True
+
+    def create(self, messages, response_model):
+        self.calls += 1
+        if self.fail and response_model is app.NotesOverview:
+            raise RuntimeError("merge failed")
+        return self.backend.create(messages=messages, response_model=response_model)
+
+    def last_call_stats(self):
+        return None
+
+
+@pytest.fixture
+def failing_merge(monkeypatch, tmp_path):
+    backend = FailingMerge(app.backend)
+    monkeypatch.setattr(app, "backend", backend)
+    monkeypatch.setattr(app, "notes_cache", NotesCache(app.GoogleDocsNotes, cache_dir=str(tmp_path)))
+    monkeypatch.setattr(app, "CHUNK_TOKEN_BUDGET", 200)
+    return backend
+
+
+def lecture():
+    lines = [f"caption {i} explaining one more idea{i * 10 // 60}:{i * 10 % 60:02d}" for i in range(60)]
+    return prepare_transcript("\n".join(lines))
+
+
+def test_fallback_overview_is_not_cached(failing_merge, tmp_path):
+    prepared = lecture()
+    notes = app.get_or_generate_notes(prepared, "chunked")
+    assert notes.title == "Class Notes"
+    assert list(tmp_path.iterdir()) == []
+
+    calls = failing_merge.calls
+    assert app.get_or_generate_notes(prepared, "chunked").title == "Class Notes"
+    assert failing_merge.calls > calls
+
+    # Once the merge works the notes are cached as usual
+    failing_merge.fail = False
+    notes = app.get_or_generate_notes(prepared, "chunked")
+    assert notes.title != "Class Notes"
+    calls = failing_merge.calls
+    assert app.get_or_generate_notes(prepared, "chunked") == notes
+    assert failing_merge.calls == calls
+
+
+def test_streamed_fallback_overview_is_not_cached(failing_merge, tmp_path):
+    prepared = lecture()
+    html = "".join(app.stream_html_content(prepared, "https://example.com/Viewer.aspx?id=1"))
+    assert "<h1>Class Notes</h1>" in html
+    assert list(tmp_path.iterdir()) == []
+    assert app.notes_cache.stats()["entries"] == 0
@@ -0,0 +1,43 @@
+import gzip
+import io
+import zlib
+
+import pytest
+
+pytest.importorskip("werkzeug")
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+from compression import iter_request_body
+
+
+def read_body(data: bytes, encoding: str, max_bytes: int = 1 << 20) -> bytes:
+    return b"".join(iter_request_body(io.BytesIO(data), encoding, max_bytes))
+
+
+def test_identity_and_gzip_round_trip():
+    payload = b'{"transcript": "hello0:01"}' * 1000
+    assert read_body(payload, None) == payload
+    assert read_body(gzip.compress(payload), "gzip") == payload
+    assert read_body(zlib.compress(payload), "deflate") == payload
+
+
+def test_compression_bomb_is_rejected():
+    # 64 MiB of zeros compresses to about 64 KiB
+    bomb = gzip.compress(b"\0" * (64 << 20))
+    chunks = iter_request_body(io.BytesIO(bomb), "gzip", 1 << 20)
+    produced = 0
+    with pytest.raises(RequestEntityTooLarge):
+        for chunk in chunks:
+            produced += len(chunk)
+    # Rejected as soon as the limit is passed, not after inflating it all
+    assert produced <= 1 << 20
+
+
+def test_plain_body_over_limit_is_rejected():
+    with pytest.raises(RequestEntityTooLarge):
+        read_body(b"x" * 2048, None, max_bytes=1024)
+
+
+def test_unsupported_encoding():
+    with pytest.raises(UnsupportedMediaType):
+        read_body(b"data", "br")
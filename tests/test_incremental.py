@@ -0,0 +1,61 @@
+from incremental import LectureState, plan_windows
+from transcript import compact_segments, parse_segments, split_into_windows
+
+BUDGET = 200
+
+
+def captions(count, start=0, step=5):
+    lines = []
+    for i in range(count):
+        seconds = start + i * step
+        lines.append(f"caption number {i} about topic {i // 10} goes here{seconds // 60}:{seconds % 60:02d}")
+    return lines
+
+
+def previous_run(lines):
+    segments = compact_segments(parse_segments(lines))
+    windows, start = [], 0
+    for window in split_into_windows(segments, BUDGET):
+        windows.append((start, start + len(window)))
+        start += len(window)
+    sections = [f"section {i}" for i in range(len(windows))]
+    return LectureState(segments, windows, sections, "overview")
+
+
+def test_unchanged_transcript_reuses_every_window():
+    lines = captions(120)
+    previous = previous_run(lines)
+    plan = plan_windows(previous, previous.segments, BUDGET)
+    assert [w.section for w in plan] == previous.sections
+
+
+def test_deleting_first_caption_only_regenerates_first_window():
+    lines = captions(120)
+    previous = previous_run(lines)
+    segments = compact_segments(parse_segments(lines[1:]))
+    plan = plan_windows(previous, segments, BUDGET)
+    assert plan[0].section is None
+    assert [w.section for w in plan[1:]] == previous.sections[1:]
+    assert [s for w in plan for s in w.segments] == segments
+
+
+def test_small_edit_regenerates_only_its_window():
+    lines = captions(120)
+    previous = previous_run(lines)
+    lines[60] = lines[60].replace("goes here", "was corrected")
+    segments = compact_segments(parse_segments(lines))
+    plan = plan_windows(previous, segments, BUDGET)
+    assert sum(w.section is None for w in plan) == 1
+    assert [s for w in plan for s in w.segments] == segments
+
+
+def test_short_fresh_run_is_folded_into_a_neighbour():
+    lines = captions(120)
+    previous = previous_run(lines)
+    # One new caption after the end of the lecture
+    segments = compact_segments(parse_segments(lines + captions(1, start=120 * 5)))
+    plan = plan_windows(previous, segments, BUDGET)
+    assert len(plan) == len(previous.windows)
+    assert plan[-1].section is None
+    assert plan[-1].segments[-1] is segments[-1]
+    assert all(w.end - w.start > 1 for w in plan)
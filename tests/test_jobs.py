@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+
+import app
+from jobs import JobManager, QueueFull
+
+TRANSCRIPT = "\n".join(f"caption {i} about the topic{i // 6}:{i % 6 * 10:02d}" for i in range(30))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_queue_full_once_workers_and_pending_are_taken():
+    manager = JobManager(workers=1, max_pending=1)
+    release = threading.Event()
+    jobs = [manager.submit(release.wait), manager.submit(release.wait)]
+    with pytest.raises(QueueFull) as excinfo:
+        manager.submit(release.wait)
+    assert excinfo.value.retry_after >= 1
+
+    release.set()
+    wait_until(lambda: all(job.status == "done" for job in jobs))
+    assert manager.submit(lambda: "again") is not None
+
+
+def test_failed_job_keeps_its_error():
+    manager = JobManager(workers=1)
+
+    def fail():
+        raise ValueError("bad transcript")
+
+    job = manager.submit(fail)
+    wait_until(lambda: job.status == "failed")
+    assert job.to_dict() == {"job_id": job.id, "status": "failed", "error": "bad transcript"}
+
+
+def test_finished_jobs_expire_after_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr("jobs.time.monotonic", clock.monotonic)
+    manager = JobManager(workers=1, ttl_seconds=60)
+    job = manager.submit(lambda: "done")
+    wait_until(lambda: job.finished_at is not None)
+
+    clock.now += 59
+    assert manager.get(job.id) is job
+    clock.now += 2
+    assert manager.get(job.id) is None
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app, "job_manager", JobManager(workers=1, max_pending=0))
+    return app.app.test_client()
+
+
+def post_job(client):
+    return client.post("/jobs", json={"transcript": TRANSCRIPT, "base_url": "https://example.com/Viewer.aspx?id=1"})
+
+
+def test_job_accepted_then_served(client):
+    response = post_job(client)
+    assert response.status_code == 202
+    location = response.headers["Location"]
+    assert location == f"/jobs/{response.get_json()['job_id']}"
+
+    wait_until(lambda: client.get(location).mimetype == "text/html")
+    response = client.get(location)
+    assert response.status_code == 200
+    assert response.mimetype == "text/html"
+    assert 'href="https://example.com/Viewer.aspx?id=1&amp;start=' in response.get_data(as_text=True)
+
+
+def test_job_queue_full_returns_429_with_retry_after(client, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(app, "render_job", lambda *args: release.wait() and "")
+    try:
+        assert post_job(client).status_code == 202
+        response = post_job(client)
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+        assert response.get_json()["retry_after"] == int(response.headers["Retry-After"])
+    finally:
+        release.set()
+
+
+def test_failed_job_returns_500(client, monkeypatch):
+    def fail(*args):
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr(app, "render_job", fail)
+    location = post_job(client).headers["Location"]
+    wait_until(lambda: client.get(location).status_code != 200)
+    response = client.get(location)
+    assert response.status_code == 500
+    assert response.get_json()["error"] == "model unavailable"
+
+
+def test_unknown_job_is_404(client):
+    assert client.get("/jobs/nope").status_code == 404
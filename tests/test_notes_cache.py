@@ -0,0 +1,61 @@
+import threading
+
+from pydantic import BaseModel
+
+from notes_cache import NotesCache
+
+
+class Notes(BaseModel):
+    text: str
+
+
+def test_waiter_gets_the_owners_result():
+    cache = NotesCache(Notes)
+    assert cache.claim("k") is None
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(cache.claim("k")))
+    waiter.start()
+    cache.release("k", Notes(text="done"))
+    waiter.join(5)
+    assert results == [Notes(text="done")]
+    assert cache.stats()["in_flight"] == 0
+
+
+def test_abandoned_claim_passes_to_a_waiter():
+    cache = NotesCache(Notes)
+    assert cache.claim("k") is None
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(cache.claim("k")))
+    waiter.start()
+    # Released without a value or error, e.g. the client went away
+    cache.release("k")
+    waiter.join(5)
+    assert results == [None]
+    assert cache.stats()["in_flight"] == 1
+    cache.release("k", Notes(text="retried"))
+    assert cache.get("k") == Notes(text="retried")
+
+
+def test_get_or_generate_releases_on_error():
+    cache = NotesCache(Notes)
+
+    def fail():
+        raise RuntimeError("boom")
+
+    try:
+        cache.get_or_generate("k", fail)
+    except RuntimeError:
+        pass
+    assert cache.stats()["in_flight"] == 0
+    assert cache.get_or_generate("k", lambda: Notes(text="ok")) == Notes(text="ok")
+
+
+def test_disk_hit_is_not_written_back(tmp_path, monkeypatch):
+    NotesCache(Notes, cache_dir=str(tmp_path)).put("k", Notes(text="saved"))
+    cache = NotesCache(Notes, cache_dir=str(tmp_path))
+    writes = []
+    monkeypatch.setattr(cache, "_write_disk", lambda key, value: writes.append(key))
+    assert cache.claim("k") == Notes(text="saved")
+    assert writes == []
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["entries"], stats["in_flight"]) == (1, 1, 0)
@@ -0,0 +1,52 @@
+from ratelimit import QuotaLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def make_limiter(monkeypatch, **kwargs):
+    clock = FakeClock()
+    monkeypatch.setattr("ratelimit.time.monotonic", clock.monotonic)
+    limiter = QuotaLimiter(**kwargs)
+    # Waiting advances the fake clock instead of sleeping
+    monkeypatch.setattr(limiter._cond, "wait", lambda timeout: setattr(clock, "now", clock.now + timeout))
+    return limiter, clock
+
+
+def test_burst_is_a_few_seconds_of_quota(monkeypatch):
+    limiter, clock = make_limiter(monkeypatch, requests_per_minute=600, tokens_per_minute=10 ** 9)
+    start = clock.now
+    for _ in range(50):
+        limiter.acquire()
+    # 5 s of burst at 10 requests/s; the rest has to wait
+    assert clock.now == start
+    limiter.acquire()
+    assert clock.now > start
+
+
+def test_any_minute_stays_within_quota_plus_burst(monkeypatch):
+    limiter, clock = make_limiter(monkeypatch, requests_per_minute=600, tokens_per_minute=10 ** 9)
+    start = clock.now
+    calls = 0
+    while clock.now - start < 60:
+        limiter.acquire()
+        calls += 1
+    assert calls <= 600 + limiter.request_capacity + 1
+
+
+def test_token_bucket_bounds_large_calls(monkeypatch):
+    limiter, clock = make_limiter(monkeypatch, requests_per_minute=10 ** 6, tokens_per_minute=60000)
+    start = clock.now
+    limiter.acquire(5000)
+    assert clock.now == start
+    # A call bigger than the bucket goes through once the bucket is full
+    # again, and the debt it leaves delays the next caller
+    limiter.acquire(20000)
+    assert 4.9 <= clock.now - start <= 5.1
+    limiter.acquire(1000)
+    assert clock.now - start >= 20
@@ -0,0 +1,89 @@
+import re
+import threading
+
+import pytest
+
+import app
+from incremental import LectureStore
+from notes_cache import NotesCache
+
+BASE_URL = "https://example.com/Viewer.aspx?id=7"
+TRANSCRIPT = "\n".join(f"caption {i} explaining one more idea{i * 10 // 60}:{i * 10 % 60:02d}" for i in range(60))
+LINK_RE = re.compile(r'href="https://example\.com/Viewer\.aspx\?id=7&amp;start=(\d+)"')
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app, "notes_cache", NotesCache(app.GoogleDocsNotes))
+    monkeypatch.setattr(app, "lecture_store", LectureStore())
+    monkeypatch.setattr(app, "CHUNK_TOKEN_BUDGET", 200)
+    return app.app.test_client()
+
+
+def stream(client):
+    response = client.post("/generate_notes/stream", json={"transcript": TRANSCRIPT, "base_url": BASE_URL},
+                           buffered=False)
+    assert response.status_code == 200
+    return response
+
+
+def decode(chunks):
+    return [chunk.decode("utf-8") if isinstance(chunk, bytes) else chunk for chunk in chunks]
+
+
+def test_head_then_sections_in_order_then_overview(client):
+    chunks = decode(stream(client).response)
+    assert "<!DOCTYPE html>" in chunks[0] and "<h1>" not in chunks[0]
+
+    sections = chunks[1:-1]
+    assert len(sections) > 1
+    first_links = []
+    for section in sections:
+        links = [int(start) for start in LINK_RE.findall(section)]
+        assert links, section
+        first_links.append(links[0])
+    assert first_links == sorted(first_links)
+
+    assert 'class="overview"' in chunks[-1]
+    assert "<h1>" in chunks[-1] and "</html>" in chunks[-1]
+
+
+def test_failed_section_ends_with_error_tail(client, monkeypatch):
+    generate = app.generate_section_with_fallback
+
+    def fail_after_first(window):
+        if window[0].seconds > 0:
+            raise RuntimeError("model unavailable")
+        return generate(window)
+
+    monkeypatch.setattr(app, "generate_section_with_fallback", fail_after_first)
+    chunks = decode(stream(client).response)
+    assert len(chunks) == 3
+    assert LINK_RE.search(chunks[1])
+    assert "Something went wrong while generating the rest of these notes." in chunks[2]
+    assert chunks[2].rstrip().endswith("</html>")
+    assert app.notes_cache.stats()["in_flight"] == 0
+
+
+def test_closing_the_stream_early_releases_the_key(client, monkeypatch):
+    generate = app.generate_section_with_fallback
+    release = threading.Event()
+
+    def slow_after_first(window):
+        if window[0].seconds > 0:
+            release.wait(5)
+        return generate(window)
+
+    monkeypatch.setattr(app, "generate_section_with_fallback", slow_after_first)
+    response = stream(client)
+    chunks = iter(response.response)
+    next(chunks)
+    next(chunks)
+    assert app.notes_cache.stats()["in_flight"] == 1
+    response.close()
+    release.set()
+    assert app.notes_cache.stats()["in_flight"] == 0
+
+    # Nothing was cached, and the next request generates the notes afresh
+    assert app.notes_cache.stats()["entries"] == 0
+    assert 'class="overview"' in decode(stream(client).response)[-1]
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from streaming_json import parse_object
+
+
+def chunked(text: str, size: int):
+    data = text.encode("utf-8")
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+DOCUMENT = {
+    "transcript": "café line one0:01\nline \"two\" \\ back0:05\n\U0001F600 emoji0:09",
+    "base_url": "https://example.com/Viewer.aspx?id=1&x=☃",
+    "count": 12.5,
+    "nested": {"a": [1, 2, {"b": None}], "c": True},
+    "negative": -3e-2,
+}
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 4096])
+def test_matches_json_loads_at_every_chunk_size(size):
+    text = json.dumps(DOCUMENT)
+    assert parse_object(chunked(text, size)) == DOCUMENT
+    # Escaped non-ASCII exercises \u escapes and surrogate pairs
+    assert parse_object(chunked(json.dumps(DOCUMENT, ensure_ascii=True), size)) == DOCUMENT
+
+
+@pytest.mark.parametrize("size", [1, 2, 5, 4096])
+def test_streamed_field_gets_its_lines(size):
+    text = json.dumps(DOCUMENT, ensure_ascii=size % 2 == 0)
+    result = parse_object(chunked(text, size), {"transcript": list})
+    assert result["transcript"] == DOCUMENT["transcript"].split("\n")
+    assert result["count"] == 12.5
+
+
+def test_streamed_field_left_unread_is_skipped():
+    text = json.dumps({"transcript": "a\nb\nc", "after": 1})
+    assert parse_object(chunked(text, 1), {"transcript": lambda lines: next(lines)}) == {"transcript": "a", "after": 1}
+
+
+def test_number_split_across_chunks():
+    assert parse_object([b'{"n": 1', b'2', b'.5', b'e1}']) == {"n": 125.0}
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "[]",
+    '{"a": 1',
+    '{"a" 1}',
+    '{"a": 1,}',
+    '{"a": "unterminated}',
+    '{"a": "\\q"}',
+    '{"a": 1} extra',
+    '{1: 2}',
+])
+def test_malformed_input_raises_value_error(text):
+    with pytest.raises(ValueError):
+        parse_object(chunked(text, 2), {"a": list})
@@ -0,0 +1,65 @@
+from transcript import Segment, clean_caption, compact_segments, parse_segments, prepare_transcript, split_timestamp
+
+
+def test_split_timestamp_plain():
+    assert split_timestamp("so today we cover recursion12:34", 700) == ("so today we cover recursion", "12:34")
+
+
+def test_split_timestamp_without_timestamp():
+    assert split_timestamp("no time here") is None
+
+
+def test_split_timestamp_keeps_trailing_digit_in_text():
+    # "look at step 2" + "5:30", not "look at step " + "25:30"
+    assert split_timestamp("look at step 25:30", 5 * 60 + 26) == ("look at step 2", "5:30")
+
+
+def test_split_timestamp_hours():
+    assert split_timestamp("value 51:02:03", 3600 + 2 * 60) == ("value 5", "1:02:03")
+
+
+def test_split_timestamp_takes_two_digits_when_one_would_go_back():
+    assert split_timestamp("next topic10:05", 9 * 60 + 58) == ("next topic", "10:05")
+
+
+def test_parse_segments_tracks_previous_timestamp():
+    segments = parse_segments(["intro0:01", "look at step 25:30", "more on that5:34", "and then10:02"])
+    assert [(s.timestamp, s.text) for s in segments] == [
+        ("0:01", "intro"),
+        ("5:30", "look at step 2"),
+        ("5:34", "more on that"),
+        ("10:02", "and then"),
+    ]
+
+
+def test_parse_segments_attaches_untimed_lines():
+    segments = parse_segments(["hello0:01", "world"])
+    assert [(s.timestamp, s.text) for s in segments] == [("0:01", "hello world")]
+
+
+def test_clean_caption_keeps_content_words():
+    assert clean_caption("Hmm okay so the HMM model is hidden markov") == "okay so the HMM model is hidden markov"
+    assert clean_caption("if you know the derivative you can solve it") == "if you know the derivative you can solve it"
+    assert clean_caption("the gap is 5 mm wide") == "the gap is 5 mm wide"
+    assert clean_caption("so the err handler") == "so the err handler"
+    assert clean_caption("I think that that is right") == "I think that that is right"
+    assert clean_caption("she had had enough, bye bye") == "she had had enough, bye bye"
+
+
+def test_clean_caption_drops_interjections_and_leading_stutter():
+    assert clean_caption("Um, so today we'll uh, talk about") == "so today we'll talk about"
+    assert clean_caption("um the the recursion") == "the recursion"
+
+
+def test_compact_segments_does_not_merge_backwards_in_time():
+    segments = [Segment(25 * 60 + 30, "25:30", "look at step"), Segment(5 * 60 + 34, "5:34", "more on that"),
+                Segment(5 * 60 + 40, "5:40", "and then"), Segment(6 * 60 + 20, "6:20", "next idea")]
+    compacted = compact_segments(segments, window_seconds=30)
+    assert [s.timestamp for s in compacted] == ["25:30", "5:34", "6:20"]
+
+
+def test_prepare_transcript_keeps_timestamps_after_digit_caption():
+    lines = ["intro0:01", "look at step 25:30", "more on that5:34", "and then5:40", "next idea6:20"]
+    prepared = prepare_transcript("\n".join(lines), window_seconds=30)
+    assert [s.timestamp for s in prepared.segments] == ["0:01", "5:30", "6:20"]
+    assert prepared.segments[1].text == "look at step 2 more on that and then"
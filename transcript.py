@@ -0,0 +1,180 @@
+import re
+from dataclasses import dataclass
+from typing import Iterable, List
+
+# The content script sends one caption per line with the timestamp glued to
+# the end of the text, e.g. "so today we'll cover recursion12:34". When the
+# text itself ends in a digit the split is ambiguous ("step 2"+"5:30" reads
+# as "step 25:30"), so parse_segments picks between candidates.
+TIMESTAMP_TAIL_RE = re.compile(r'(\d+)(:\d{2}(?::\d{2})?)\s*$')
+
+
+@dataclass
+class Segment:
+    seconds: int
+    timestamp: str
+    text: str
+
+
+def timestamp_to_seconds(timestamp):
+    parts = timestamp.split(':')
+    if len(parts) == 2:
+        return int(parts[0]) * 60 + int(parts[1])
+    elif len(parts) == 3:
+        return int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
+    else:
+        return 0  # Return 0 for invalid formats
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text
+    return len(text) // 4 + 1
+
+
+def split_timestamp(line: str, previous_seconds: int = 0):
+    """
+    Split a caption line into (text, timestamp), or return None if it has
+    no trailing timestamp.
+
+    The leading part of the timestamp may take one or two of the trailing
+    digits. The shortest reading that doesn't go back in time from
+    previous_seconds wins, so a digit at the end of the text stays text.
+    """
+    match = TIMESTAMP_TAIL_RE.search(line)
+    if match is None:
+        return None
+    digits = match.group(1)
+    candidates = []
+    for length in (1, 2):
+        if length <= len(digits):
+            cut = match.start(1) + len(digits) - length
+            candidates.append((line[:cut].rstrip(), digits[-length:] + match.group(2)))
+    for text, timestamp in candidates:
+        if timestamp_to_seconds(timestamp) >= previous_seconds:
+            return text, timestamp
+    return candidates[0]
+
+
+def parse_segments(lines: Iterable[str]) -> List[Segment]:
+    segments = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        split = split_timestamp(line, segments[-1].seconds if segments else 0)
+        if split:
+            text, timestamp = split
+            segments.append(Segment(timestamp_to_seconds(timestamp), timestamp, text))
+        elif segments:
+            # Untimed text belongs to the previous caption
+            segments[-1].text = f"{segments[-1].text} {line}"
+        else:
+            segments.append(Segment(0, "0:00", line))
+    return segments
+
+
+def format_segments(segments: List[Segment]) -> str:
+    return "\n".join(f"[{segment.timestamp}] {segment.text}" for segment in segments)
+
+
+def split_into_windows(segments: List[Segment], token_budget: int) -> List[List[Segment]]:
+    """
+    Group consecutive segments into windows of at most token_budget tokens.
+
+    Windows always break between captions, so every window starts and ends
+    on a timestamp. A single caption larger than the budget gets its own
+    window.
+    """
+    windows = []
+    current = []
+    current_tokens = 0
+    for segment in segments:
+        tokens = estimate_tokens(segment.text) + 3  # "[MM:SS] " prefix
+        if current and current_tokens + tokens > token_budget:
+            windows.append(current)
+            current = []
+            current_tokens = 0
+        current.append(segment)
+        current_tokens += tokens
+    if current:
+        windows.append(current)
+    return windows
+
+
+# Only standalone interjections are dropped: at the start of a caption, or
+# set off by a following comma or period. Matching is case-sensitive so
+# acronyms like "HMM" survive.
+FILLER = r"(?:[Uu]m+|[Uu]h+|[Ee]rm+|[Hh]mm+)"
+LEADING_FILLER_RE = re.compile(rf"^(?:{FILLER}\b[,.!?]*\s*)+")
+SET_OFF_FILLER_RE = re.compile(rf"\s*\b{FILLER}[,.]")
+# Stutters at the start of a caption ("the the recursion")
+LEADING_STUTTER_RE = re.compile(r"^(\w+)(?:\s+\1\b)+", re.IGNORECASE)
+
+
+def clean_caption(text: str) -> str:
+    text = LEADING_FILLER_RE.sub("", text.strip())
+    text = SET_OFF_FILLER_RE.sub("", text)
+    text = LEADING_STUTTER_RE.sub(r"\1", text)
+    return " ".join(text.split())
+
+
+def compact_segments(segments: List[Segment], window_seconds: int = 30, max_chars: int = 600) -> List[Segment]:
+    """
+    Merge short adjacent captions that fall in the same window_seconds slot
+    of the lecture, dropping filler words and captions that repeat the
+    previous one.
+
+    Slots sit on a fixed time grid rather than chaining from the first
+    caption, so editing one caption only changes its own slot. Each merged
+    segment keeps the timestamp of its first caption, so every timestamp
+    the model can cite still points into the lecture.
+    """
+    compacted = []
+    previous_text = None
+    for segment in segments:
+        text = clean_caption(segment.text)
+        if not text or text.lower() == previous_text:
+            continue
+        previous_text = text.lower()
+
+        current = compacted[-1] if compacted else None
+        if (current is not None
+                and current.seconds <= segment.seconds
+                and segment.seconds // window_seconds == current.seconds // window_seconds
+                and len(current.text) + len(text) < max_chars):
+            if not f" {current.text.lower()}".endswith(f" {previous_text}"):
+                current.text = f"{current.text} {text}"
+        else:
+            compacted.append(Segment(segment.seconds, segment.timestamp, text))
+    return compacted
+
+
+@dataclass
+class PreparedTranscript:
+    segments: List[Segment]
+    text: str
+    tokens_before: int
+    tokens_after: int
+    chars_before: int = 0
+
+
+def prepare_transcript_lines(lines: Iterable[str], window_seconds: int = 30) -> PreparedTranscript:
+    """
+    Like prepare_transcript, for a transcript that arrives line by line; the
+    raw text is never held in memory as a whole.
+    """
+    chars = 0
+
+    def counted(lines):
+        nonlocal chars
+        for line in lines:
+            chars += len(line) + 1
+            yield line
+
+    segments = compact_segments(parse_segments(counted(lines)), window_seconds)
+    text = format_segments(segments)
+    return PreparedTranscript(segments, text, chars // 4 + 1, estimate_tokens(text), chars)
+
+
+def prepare_transcript(transcript: str, window_seconds: int = 30) -> PreparedTranscript:
+    return prepare_transcript_lines(transcript.splitlines(), window_seconds)